@@ -2,26 +2,25 @@ import cv2
 import torch
 import yaml
 from ultralytics import YOLO
-import queue
 import threading
 import time
 import serial
-from datetime import datetime
-import sys
+import shutil
 from pathlib import Path
 from typing import Optional, Tuple, List
 import numpy as np
 
+from utils import CommandVotes, FramePool, FrameSlot, Logger, filter_contained, line_buffered_stdout
 
-class Logger:
-    def __init__(self, name: str):
-        self.name = name
-        self.start_time = time.time()
 
-    def log(self, message: str, level: str = "INFO"):
-        timestamp = time.time() - self.start_time
-        print(f"[{timestamp:.2f}s] {level} - {self.name}: {message}")
-        sys.stdout.flush()
+MODEL_STRIDE = 32  # YOLO's largest stride; input sizes must be multiples of it
+
+
+def align_imgsz(imgsz):
+    """Round an int or (h, w) inference size up to a multiple of the model stride"""
+    if isinstance(imgsz, int):
+        return -(-imgsz // MODEL_STRIDE) * MODEL_STRIDE
+    return [align_imgsz(size) for size in imgsz]
 
 
 class PearDetectionModel:
@@ -34,36 +33,135 @@ class PearDetectionModel:
         )
         self.logger.log(f"Using device: {self.device}")
 
+        self.imgsz = align_imgsz(config.get("imgsz", 640))
+        if self.imgsz != config.get("imgsz", 640):
+            self.logger.log(f"imgsz rounded up to stride {MODEL_STRIDE}: {self.imgsz}", "WARNING")
+        self.precision = config.get("precision", "fp16")
+        self.conf_threshold = config.get("conf_threshold", 0.7)
+        self.iou_threshold = config.get("iou_threshold", 0.7)
+        # Off by default: a defect box reaching past the fruit box would otherwise be lost
+        self.defect_margin = (config.get("defect_margin", 16)
+                              if config.get("defect_containment", False) else None)
+        model_path = self._resolve_model_path(config["model_path"])
+
         try:
-            self.model = YOLO(config["model_path"], task="detect")
+            self.model = YOLO(model_path, task="detect")
+            self.half = self.precision == "fp16"
+            if model_path.endswith(".pt"):
+                # No engine: still run FP16 kernels on CUDA (on CPU FP16 is slower, keep FP32)
+                self.half = self.device.type == "cuda"
+                if self.half:
+                    self.model.model.half()
+            # One engine per inference worker: the GPU one first, then any DLA engines
+            self.models = [self.model] + self._load_dla_models(config)
             self.names = config["classes"]
+            # Class ids looked up once so per-frame checks compare integers only
+            self.fruit_id = self.names.index("fruit")
+            self.defect_id = self.names.index("defect")
             self.logger.log("Model loaded successfully")
             self.logger.log(f"Classes: {self.names}")
         except Exception as e:
             self.logger.log(f"Error loading model: {e}", "ERROR")
             raise
 
-    def detect(self, img: np.ndarray) -> np.ndarray:
-        """Run detection on image"""
+        self._warmup()
+
+    def _warmup(self) -> None:
+        """Run a dummy frame so engine setup doesn't stall the first real frame"""
+        start = time.time()
+        for worker in range(len(self.models)):
+            self.detect(np.zeros((480, 640, 3), dtype=np.uint8), worker)
+        self.logger.log(f"Warmup done in {time.time() - start:.2f}s")
+
+    def _resolve_model_path(self, model_path: str) -> str:
+        """Fall back to the PyTorch checkpoint when the TensorRT engine is missing"""
+        path = Path(model_path)
+        if path.suffix == ".engine" and not path.exists():
+            fallback = path.with_suffix(".pt")
+            self.logger.log(f"Engine {path} not found, falling back to {fallback}", "WARNING")
+            return str(fallback)
+        return model_path
+
+    def _load_dla_models(self, config) -> List[YOLO]:
+        """Load the DLA engine when the platform has DLA cores (Xavier/Orin, not the Nano)"""
+        dla_path = config.get("dla_model_path")
+        if not dla_path:
+            return []
+        if num_dla_cores() == 0:
+            self.logger.log("No DLA cores available, running on GPU only")
+            return []
+        if not Path(dla_path).exists():
+            self.logger.log(f"DLA engine {dla_path} not found, running on GPU only", "WARNING")
+            return []
+        self.logger.log(f"Loaded DLA engine {dla_path}")
+        return [YOLO(dla_path, task="detect")]
+
+    def detect(self, img: np.ndarray, worker: int = 0) -> Tuple[bool, np.ndarray, np.ndarray]:
+        """Run detection on a BGR image, filtering on device and copying only the kept boxes"""
         try:
-            results = self.model.predict(img)
-            return results[0].boxes.cpu().numpy()
+            # NMS drops boxes under conf_threshold, so no confidence mask is needed after it
+            results = self.models[worker].predict(
+                img,
+                imgsz=self.imgsz,
+                half=self.half,
+                conf=self.conf_threshold,
+                iou=self.iou_threshold,
+                verbose=False,
+            )
+            boxes = results[0].boxes
+            xyxy, cls = boxes.xyxy.cpu().numpy(), boxes.cls.cpu().numpy()
+            if self.defect_margin is not None:
+                xyxy, cls = filter_contained(xyxy, cls, self.defect_id, self.fruit_id, self.defect_margin)
+            has_defect = bool((cls == self.defect_id).any())
+            return has_defect, xyxy, cls
         except Exception as e:
             self.logger.log(f"Detection error: {e}", "ERROR")
-            return np.array([])
+            return False, np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32)
 
-    def inference(self, img: np.ndarray) -> Tuple[int, np.ndarray]:
-        """Run inference and return result and boxes"""
-        pred = self.detect(img)
+    def inference(self, img: np.ndarray, worker: int = 0) -> Tuple[int, np.ndarray, np.ndarray]:
+        """Run inference on a BGR frame and return result, boxes and classes"""
+        # 1 if any defect is detected, 0 otherwise
+        has_defect, xyxy, cls = self.detect(img, worker)
+        return int(has_defect), xyxy, cls
 
-        pred = pred[pred.conf > 0.7]
-        labels = [self.names[int(cat)] for cat in pred.cls]
 
-        # if any classes rather than "normal_pear_box" is detected, return 0 else return 1
-        if any([label == "defect" for label in labels]):
-            return 1, pred.xyxy, pred.cls
-        else:
-            return 0, pred.xyxy, pred.cls
+def num_dla_cores() -> int:
+    """Number of DLA cores TensorRT can build for (0 on the original Jetson Nano)"""
+    try:
+        import tensorrt as trt
+
+        return trt.Builder(trt.Logger(trt.Logger.ERROR)).num_DLA_cores
+    except Exception:
+        return 0
+
+
+def export_engine(config, dla_core: Optional[int] = None) -> str:
+    """Export the PyTorch checkpoint to a fixed-shape FP16 or INT8 TensorRT engine"""
+    weights = Path(config["model_path"]).with_suffix(".pt")
+    target = {}
+    if dla_core is not None:
+        # Export from a copy named after the DLA engine so the GPU engine isn't overwritten
+        dla_weights = Path(config["dla_model_path"]).with_suffix(".pt")
+        shutil.copyfile(weights, dla_weights)
+        weights = dla_weights
+        target = {"device": f"dla:{dla_core}"}
+    model = YOLO(str(weights), task="detect")
+    precision = config.get("precision", "fp16")
+    if precision == "int8":
+        # TensorRT calibrates on the images listed in calib_data and caches the table
+        quantization = {"int8": True, "data": config["calib_data"]}
+    elif precision == "fp16":
+        quantization = {"half": True}
+    else:
+        raise ValueError(f"Unsupported precision: {precision}")
+    return model.export(
+        format="engine",
+        simplify=True,
+        dynamic=False,
+        imgsz=align_imgsz(config.get("imgsz", 640)),
+        **quantization,
+        **target,
+    )
 
 
 class ArduinoController:
@@ -72,8 +170,7 @@ class ArduinoController:
         self.port = port
         self.baudrate = baudrate
         self.arduino = None
-        self.last_command_time = time.time()
-        self.running = True
+        self.stop_event = threading.Event()
         self.command_count = {'ON': 0, 'OFF': 0}
         self.last_status_time = time.time()
         self.status_interval = 60  # Print status every 60 seconds
@@ -108,44 +205,19 @@ class ArduinoController:
             self.logger.log(f"Error sending command: {e}", "ERROR")
             return False
 
-    def process_commands(self, command_queue: queue.Queue):
-        """Main command processing loop"""
+    def process_commands(self, votes: CommandVotes):
+        """Main command processing loop, deciding once per time_delay window"""
         if not self.connect():
             return
 
         try:
-            while self.running:
+            while not self.stop_event.wait(self.time_delay):
                 try:
-                    # Collect commands for 5 seconds
-                    commands = []
-
-                    try:
-                        update_queue_time = time.time()
-                        while time.time() - update_queue_time < self.time_delay:
-                            cmd = command_queue.get_nowait()
-                            if cmd is None:  # Exit signal
-                                self.running = False
-                                break
-                            commands.append(cmd)
-                    except queue.Empty:
-                        time.sleep(0.1)  # Short sleep to prevent busy waiting
-                        pass
-
-                    if not self.running:
-                        break
-
-                    if commands and (time.time() - self.last_command_time >= self.time_delay):
-                        # Count ON vs OFF commands
-                        on_count = commands.count('ON\n')
-                        off_count = commands.count('OFF\n')
-
-                        if on_count > off_count:
-                            if self.send_command('ON\n'):
-                                time.sleep(1)
-                                self.send_command('OFF\n')
-                        self.last_command_time = time.time()
-
-                    update_queue_time = time.time()
+                    on_count, off_count = votes.snapshot_and_reset()
+                    if on_count > off_count:
+                        if self.send_command('ON\n'):
+                            time.sleep(1)
+                            self.send_command('OFF\n')
 
                 except Exception as e:
                     self.logger.log(f"Command processing error: {e}", "ERROR")
@@ -154,6 +226,10 @@ class ArduinoController:
         finally:
             self.cleanup()
 
+    def stop(self):
+        """Ask the command loop to exit after its current window"""
+        self.stop_event.set()
+
     def cleanup(self):
         """Clean up resources"""
         try:
@@ -167,15 +243,38 @@ class ArduinoController:
             self.logger.log(f"Error during cleanup: {e}", "ERROR")
 
 
+# CSI camera pipeline that keeps frames in NVMM until the final BGR conversion
+GST_PIPELINE = (
+    "nvarguscamerasrc sensor-id={camera_id} ! "
+    "video/x-raw(memory:NVMM), width={width}, height={height}, framerate={fps}/1 ! "
+    "nvvidconv ! video/x-raw, format=BGRx ! videoconvert ! video/x-raw, format=BGR ! "
+    "appsink drop=1 max-buffers=1"
+)
+
+
+MAX_DRAIN_GRABS = 4  # Upper bound on stale frames a V4L2/GStreamer queue holds
+
+
 class VideoCapture:
-    def __init__(self, camera_id: int = 0):
+    def __init__(self, camera_id: int = 0, width: int = 640, height: int = 480,
+                 fps: int = 30, gstreamer: bool = False):
         self.logger = Logger("Camera")
-        self.cap = cv2.VideoCapture(camera_id)
-        # Set the resolution to 640x480
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        self.frame_count = 0
-        self.start_time = time.time()
+        self.width = width
+        self.height = height
+        self.frame_interval = 1.0 / fps
+        if gstreamer:
+            pipeline = GST_PIPELINE.format(camera_id=camera_id, width=width, height=height, fps=fps)
+            self.cap = cv2.VideoCapture(pipeline, cv2.CAP_GSTREAMER)
+        else:
+            self.cap = cv2.VideoCapture(camera_id, cv2.CAP_V4L2)
+            # MJPG lets UVC cameras deliver full frame rate instead of raw YUYV
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Don't queue stale frames in the driver
+        self.frame_count = 0  # frames in the current FPS window
+        self.window_start = time.perf_counter()
 
         if not self.cap.isOpened():
             self.logger.log("Failed to open camera", "ERROR")
@@ -183,26 +282,134 @@ class VideoCapture:
 
         self.logger.log("Camera initialized successfully")
 
-    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
-        """Read frame from camera with FPS logging"""
-        ret, frame = self.cap.read()
+    def read(self, dst: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        """Read the newest frame with FPS logging, decoding into dst when given"""
+        if not self._grab_latest():
+            return False, None
+        ret, frame = self.cap.retrieve(dst)
 
         if ret:
             self.frame_count += 1
-            if self.frame_count % 30 == 0:  # Log FPS every 30 frames
-                elapsed = time.time() - self.start_time
-                fps = self.frame_count / elapsed
+            if self.frame_count >= 30:  # Log FPS every 30 frames, the clock is read once per window
+                now = time.perf_counter()
+                fps = self.frame_count / (now - self.window_start)
                 self.logger.log(f"FPS: {fps:.2f}")
+                self.window_start = now
+                self.frame_count = 0
 
         return ret, frame
 
+    def _grab_latest(self) -> bool:
+        """Grab until the driver queue is empty so retrieve() decodes the freshest frame"""
+        # Queued frames come back at once; a grab that has to wait is at the live edge.
+        # Bounded because grab() never fails on a live camera.
+        for _ in range(MAX_DRAIN_GRABS):
+            start = time.perf_counter()
+            if not self.cap.grab():
+                return False
+            if time.perf_counter() - start >= self.frame_interval / 2:
+                break
+        return True
+
+    def capture_frames(self, frame_slot: FrameSlot, pool: FramePool,
+                       stop_event: threading.Event):
+        """Producer loop publishing the newest frame to frame_slot"""
+        warned = False
+        while not stop_event.is_set():
+            buf = pool.acquire()
+            if buf is None:
+                # Every buffer is still in use downstream: drop this frame
+                self.cap.grab()
+                continue
+            ret, frame = self.read(buf)
+            if not ret or frame is None:
+                pool.release(buf)
+                self.logger.log("Failed to read frame", "ERROR")
+                stop_event.set()
+                break
+            if frame is not buf:
+                # retrieve() only decodes in place when the shapes match, otherwise every
+                # frame is a fresh allocation again
+                if not warned:
+                    self.logger.log(f"Frame shape {frame.shape} doesn't match pooled buffers "
+                                    f"{buf.shape}, frames won't be reused", "WARNING")
+                    warned = True
+                pool.release(buf)
+            pool.release(frame_slot.put(frame))
+
     def release(self):
         """Release camera resources"""
         self.cap.release()
         self.logger.log("Camera released")
 
 
+def collect_calibration_frames(output_dir: str, count: int = 300, interval: float = 0.5):
+    """Save representative camera frames for INT8 calibration"""
+    logger = Logger("Calibration")
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    camera = VideoCapture(0)
+    try:
+        saved = 0
+        while saved < count:
+            ret, frame = camera.read()
+            if not ret:
+                logger.log("Failed to read frame", "ERROR")
+                break
+            cv2.imwrite(str(output / f"frame_{saved:04d}.jpg"), frame)
+            saved += 1
+            time.sleep(interval)  # Spread samples over the scene instead of near-duplicates
+        logger.log(f"Saved {saved} frames to {output}")
+    finally:
+        camera.release()
+
+
+FRUIT_COLOR = (0, 255, 0)
+DEFECT_COLOR = (0, 0, 255)
+BOX_THICKNESS = 2
+
+
+def infer_frames(model: PearDetectionModel, worker: int, frame_slot: FrameSlot,
+                 pool: FramePool, votes: CommandVotes, stop_event: threading.Event):
+    """Extra inference worker driving a DLA engine; its frames only vote, they aren't shown"""
+    while not stop_event.is_set():
+        frame = frame_slot.get(timeout=1)
+        if frame is None:
+            continue
+        result, _, _ = model.inference(frame, worker)
+        votes.add(result)
+        pool.release(frame)
+
+
+def draw_results(frame: np.ndarray, result: int, boxes: np.ndarray, cls: np.ndarray,
+                 fruit_id: int):
+    """Draw boxes (green for fruit, red for defects) and the overall result in place"""
+    # Cast all corners in one call; tolist() gives the plain ints cv2 expects
+    for (x1, y1, x2, y2), cl in zip(boxes[:, :4].astype(np.int32).tolist(), cls):
+        color = FRUIT_COLOR if cl == fruit_id else DEFECT_COLOR
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, BOX_THICKNESS)
+
+    cv2.putText(frame,
+                f"Result: {'Normal' if result == 0 else 'Abnormal'}",
+                (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, FRUIT_COLOR, BOX_THICKNESS)
+
+
+def display_frames(display_slot: FrameSlot, pool: FramePool, stop_event: threading.Event):
+    """Show annotated frames off the inference thread; 'q' stops the pipeline"""
+    logger = Logger("Display")
+    while not stop_event.is_set():
+        frame = display_slot.get(timeout=0.1)
+        if frame is not None:
+            cv2.imshow('Pear Detection', frame)  # imshow copies, so the buffer can be reused
+            pool.release(frame)
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            logger.log("Quit signal received")
+            stop_event.set()
+    cv2.destroyAllWindows()
+
+
 def main(config_path: str):
+    line_buffered_stdout()
     logger = Logger("Main")
     logger.log("Starting Pear Detection System")
 
@@ -214,48 +421,72 @@ def main(config_path: str):
 
         # Initialize components
         model = PearDetectionModel(config)
-        camera = VideoCapture(0)
-        command_queue = queue.Queue()
+        camera = VideoCapture(0, gstreamer=config.get("gstreamer", False))
+        votes = CommandVotes()
+
+        # Capture runs in its own thread so the GPU isn't idle while waiting on the camera
+        cv2.setNumThreads(1)  # Avoid oversubscribing the cores shared with the capture thread
+        frame_slot = FrameSlot()
+        # One buffer per pipeline stage: capture, frame slot, display slot, display and
+        # one per inference worker, so the capture thread never runs dry
+        pool = FramePool((camera.height, camera.width, 3), size=4 + len(model.models))
+        stop_event = threading.Event()
+        capture_thread = threading.Thread(
+            target=camera.capture_frames,
+            args=(frame_slot, pool, stop_event),
+            daemon=True
+        )
+        capture_thread.start()
+        logger.log("Capture thread started")
+
+        # Rendering is optional and never blocks inference (headless deployments skip it)
+        display = config.get("display", True)
+        display_slot = FrameSlot()
+        display_thread = threading.Thread(
+            target=display_frames,
+            args=(display_slot, pool, stop_event),
+            daemon=True
+        )
+        if display:
+            display_thread.start()
+            logger.log("Display thread started")
+
+        # DLA engines take frames alongside the GPU engine in the main loop
+        for worker in range(1, len(model.models)):
+            threading.Thread(
+                target=infer_frames,
+                args=(model, worker, frame_slot, pool, votes, stop_event),
+                daemon=True
+            ).start()
+            logger.log(f"Inference worker {worker} started")
 
         # Start Arduino thread
         arduino_controller = ArduinoController()
         arduino_thread = threading.Thread(
             target=arduino_controller.process_commands,
-            args=(command_queue,)
+            args=(votes,)
         )
         arduino_thread.start()
         logger.log("Arduino thread started")
 
         # Main processing loop
-        while True:
-            ret, frame = camera.read()
-            if not ret:
-                logger.log("Failed to read frame", "ERROR")
-                break
+        while not stop_event.is_set():
+            frame = frame_slot.get(timeout=1)
+            if frame is None:
+                continue
 
-            # Run inference
+            # Run inference on the BGR frame as captured: ultralytics treats numpy
+            # input as BGR and swaps channels in its own preprocess
             result, boxes, cls = model.inference(frame)
 
-            # Send command
-            command_queue.put('ON\n' if result == 1 else 'OFF\n')
-
-            # Draw results
-            for box, cl in zip(boxes, cls):
-                x1, y1, x2, y2 = map(int, box[:4])
-                if cl == 0:
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                else:
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
-
-            cv2.putText(frame,
-                        f"Result: {'Normal' if result == 0 else 'Abnormal'}",
-                        (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+            # Vote for the Arduino's next decision
+            votes.add(result)
 
-            cv2.imshow('Pear Detection', frame)
-
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                logger.log("Quit signal received")
-                break
+            if display:
+                draw_results(frame, result, boxes, cls, model.fruit_id)
+                pool.release(display_slot.put(frame))
+            else:
+                pool.release(frame)
 
     except KeyboardInterrupt:
         logger.log("Program interrupted by user")
@@ -264,9 +495,12 @@ def main(config_path: str):
     finally:
         # Cleanup
         logger.log("Cleaning up...")
+        stop_event.set()
+        capture_thread.join(timeout=2)
         camera.release()
-        cv2.destroyAllWindows()
-        command_queue.put(None)
+        if display_thread.is_alive():
+            display_thread.join(timeout=2)
+        arduino_controller.stop()
         arduino_thread.join()
         logger.log("Cleanup complete")
 
@@ -276,6 +510,18 @@ if __name__ == "__main__":
 
     parser = argparse.ArgumentParser()
     parser.add_argument("--config", type=str, default="yolo_config.yml")
+    parser.add_argument("--export", action="store_true",
+                        help="export the .pt checkpoint to a TensorRT engine and exit")
+    parser.add_argument("--export-dla", type=int, default=None, metavar="CORE",
+                        help="export a TensorRT engine for DLA core CORE to dla_model_path and exit")
+    parser.add_argument("--collect-calib", type=int, default=0, metavar="N",
+                        help="save N camera frames to calib/images for INT8 calibration and exit")
     args = parser.parse_args()
 
-    main(args.config)
+    if args.collect_calib:
+        collect_calibration_frames("calib/images", args.collect_calib)
+    elif args.export or args.export_dla is not None:
+        with open(args.config) as f:
+            print(f"Exported engine: {export_engine(yaml.safe_load(f), args.export_dla)}")
+    else:
+        main(args.config)
@@ -0,0 +1,5 @@
+from .boxes import filter_contained
+from .handoff import CommandVotes, FramePool, FrameSlot
+from .logger import Logger, line_buffered_stdout
+
+__all__ = ["CommandVotes", "FramePool", "FrameSlot", "Logger", "filter_contained", "line_buffered_stdout"]
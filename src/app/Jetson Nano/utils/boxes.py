@@ -0,0 +1,20 @@
+from typing import Tuple
+
+import numpy as np
+
+
+def filter_contained(xyxy: np.ndarray, cls: np.ndarray, inner_id: int, outer_id: int,
+                     margin: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+    """Drop inner_id boxes that are not inside any outer_id box grown by margin pixels"""
+    is_inner = cls == inner_id
+    d = xyxy[is_inner][:, None, :]  # (D, 1, 4)
+    f = xyxy[cls == outer_id][None, :, :]  # (1, F, 4)
+    inside = (
+        (d[..., 0] >= f[..., 0] - margin)
+        & (d[..., 1] >= f[..., 1] - margin)
+        & (d[..., 2] <= f[..., 2] + margin)
+        & (d[..., 3] <= f[..., 3] + margin)
+    )  # (D, F)
+    keep = ~is_inner
+    keep[is_inner] = inside.any(axis=1)
+    return xyxy[keep], cls[keep]
@@ -0,0 +1,72 @@
+import threading
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+import numpy as np
+
+
+class CommandVotes:
+    """Per-window tally of frame results shared by the inference and Arduino threads"""
+
+    def __init__(self, maxlen: int = 256):
+        # Lock-free: append/popleft are atomic, oldest results drop if the window overflows
+        self.results: Deque[int] = deque(maxlen=maxlen)
+
+    def add(self, result: int):
+        self.results.append(result)
+
+    def snapshot_and_reset(self) -> Tuple[int, int]:
+        window = [self.results.popleft() for _ in range(len(self.results))]
+        on = sum(window)
+        return on, len(window) - on
+
+
+class FrameSlot:
+    """Single-frame handoff between threads that always holds the newest frame"""
+
+    def __init__(self):
+        # deque append/pop are atomic, so the producer takes no lock per frame
+        self._frames = deque(maxlen=1)
+        self._ready = threading.Event()
+
+    def put(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        """Publish frame, returning the stale frame it replaced (if any)"""
+        try:
+            stale = self._frames.pop()
+        except IndexError:
+            stale = None
+        self._frames.append(frame)
+        if not self._ready.is_set():
+            self._ready.set()
+        return stale
+
+    def get(self, timeout: float) -> Optional[np.ndarray]:
+        """Take the newest frame, or None if none arrives within timeout"""
+        while True:
+            try:
+                return self._frames.pop()
+            except IndexError:
+                if not self._ready.wait(timeout):
+                    return None
+                self._ready.clear()
+
+
+class FramePool:
+    """Reusable frame buffers the camera decodes into instead of allocating per frame"""
+
+    def __init__(self, shape: Tuple[int, int, int], size: int = 5):
+        # Plain host memory: Ultralytics letterboxes into its own array before the upload,
+        # so page-locking these would not save a copy
+        self._buffers = [np.empty(shape, dtype=np.uint8) for _ in range(size)]
+        self._free = deque(self._buffers)
+
+    def acquire(self) -> Optional[np.ndarray]:
+        try:
+            return self._free.popleft()
+        except IndexError:
+            return None
+
+    def release(self, buf: Optional[np.ndarray]):
+        # Frames OpenCV had to allocate itself (size mismatch) are simply dropped
+        if buf is not None and any(buf is b for b in self._buffers):
+            self._free.append(buf)
@@ -0,0 +1,40 @@
+import queue
+import threading
+import time
+from collections import deque
+from typing import Deque, Optional
+
+
+class CommandQueue:
+    """Single-producer/single-consumer command buffer with the queue.Queue get/put shape"""
+
+    def __init__(self, maxlen: int = 128):
+        # deque append/popleft are atomic under the GIL, so no mutex is needed per command
+        self.items: Deque[str] = deque(maxlen=maxlen)
+        self.ready = threading.Event()
+
+    def put(self, cmd):
+        self.items.append(cmd)
+        if not self.ready.is_set():
+            self.ready.set()
+
+    def get_nowait(self):
+        try:
+            return self.items.popleft()
+        except IndexError:
+            raise queue.Empty
+
+    def get(self, timeout: Optional[float] = None):
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            try:
+                return self.items.popleft()
+            except IndexError:
+                pass
+            remaining = None if deadline is None else deadline - time.time()
+            if remaining is not None and remaining <= 0:
+                raise queue.Empty
+            if not self.ready.wait(remaining):
+                raise queue.Empty
+            # Clear before retrying the pop so a put() racing with us is never missed
+            self.ready.clear()
@@ -1,4 +1,18 @@
 RASPBERRY_IP = '192.168.0.43'
 YOLO_CONFIG_FILE = 'yolo_config.yml' # using for YOLO model
 CAMERA_ORDER = 0 # which camera to request for image (from Raspberry Pi)
-arduino_serial_port = '/dev/ttyACM0' # serial port to communicate with Arduino
\ No newline at end of file
+arduino_serial_port = '/dev/ttyACM0' # serial port to communicate with Arduino
+STREAM_FPS = 30 # frame rate of the Raspberry Pi stream
+MAX_BATCH_LATENCY = 0.15 # seconds of frames batched into one inference call (engine batch is in yolo_config.yml)
+STREAM_CHUNK_SIZE = 65536 # bytes read from the MJPEG stream per iteration (a 640x480 JPEG is ~30-60 KB)
+USE_NVJPEG = True # decode stream JPEGs on the hardware decoder through torchvision, falls back to OpenCV
+ARDUINO_CPU = 1 # core reserved for the Arduino command thread (None leaves it unpinned)
+STREAM_CPUS = () # one core per MJPEG reader thread, in the order the streams are created (empty leaves them unpinned)
+ARDUINO_NICE = 0 # negative values boost the Arduino thread's priority, needs CAP_SYS_NICE
+STREAM_DOWNSCALE = 1 # decode stream frames at 1/2, 1/4 or 1/8 size inside libjpeg (2 suits 1080p streams with imgsz 640)
+FAST_JPEG_DCT = True # CPU decode through PyTurboJPEG's fast IDCT when it is installed, slightly less precise
+STREAM_RCVBUF = 4 * 1024 * 1024 # socket receive buffer for the MJPEG stream, absorbs bitrate bursts
+STREAM_MAX_BACKOFF = 30 # seconds, upper bound of the reconnect delay after the stream drops
+DECODE_WORKERS = 4 # JPEG decode threads shared by all camera streams
+STREAM_MAX_BUFFER = 4 * 1024 * 1024 # unconsumed stream bytes allowed before the reader drops them and resyncs
+STREAM_GRAYSCALE = False # decode only the JPEG luma plane, for models trained on grayscale (the pear model expects BGR)
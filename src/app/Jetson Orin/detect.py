@@ -1,85 +1,350 @@
+import os
 import cv2
 import numpy as np
-import requests
-from urllib.parse import urljoin
+import torch
+import socket
+from urllib.parse import urlsplit
 import threading
 import time
 import logging
 import yaml
 import queue
+import selectors
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
 
-from inference import PearDetectionModel, Logger
+from command_queue import CommandQueue
 from config import *
+from inference import PearDetectionModel
+from logger import Logger, line_buffered_stdout
+from mjpeg import StreamParser
 
 import serial
 
+try:
+    from torchvision.io import decode_jpeg
+except ImportError:  # torchvision is optional, frames are then decoded on the CPU with OpenCV
+    decode_jpeg = None
+
+try:
+    from turbojpeg import (
+        TJFLAG_FASTDCT,
+        TJFLAG_FASTUPSAMPLE,
+        TJPF_BGR,
+        TJPF_GRAY,
+        TurboJPEG,
+    )
+except ImportError:  # PyTurboJPEG is optional, cv2.imdecode then does the CPU decode
+    TurboJPEG = None
+
 # Set up logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
+# imdecode flags that make libjpeg scale during the IDCT, keyed by downscale factor
+DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+# Luma-only equivalents, libjpeg then skips chroma upsampling and the YCbCr to BGR conversion
+GRAY_DECODE_FLAGS = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+
+def opencv_jpeg_library() -> str:
+    """JPEG library OpenCV was built against, as listed in its build information"""
+    for line in cv2.getBuildInformation().splitlines():
+        if line.strip().startswith("JPEG:"):
+            return line.split(":", 1)[1].strip()
+    return "unknown"
+
+
+def pin_thread(logger: Logger, cpu, niceness: int = 0):
+    """Pin the calling thread to one CPU and adjust its niceness, best effort"""
+    # Only called from inside the worker threads: threads spawned later inherit the mask
+    if cpu is not None:
+        try:
+            os.sched_setaffinity(0, {cpu})
+            logger.log(f"Pinned to CPU {cpu}")
+        except (AttributeError, OSError, ValueError) as e:
+            logger.log(f"Could not pin to CPU {cpu}: {e}", "WARNING")
+    if niceness:
+        try:
+            os.nice(niceness)
+        except OSError as e:
+            logger.log(f"Could not change niceness to {niceness}: {e}", "WARNING")
+
+
+# CPUs the process may use, captured before any thread pins itself
+PROCESS_CPUS = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else None
+
+
+def unpin_thread():
+    """Pool initializer: drop the CPU pin a worker inherits from the thread that spawned it"""
+    if PROCESS_CPUS is not None:
+        try:
+            os.sched_setaffinity(0, PROCESS_CPUS)
+        except OSError:
+            pass
+
+
+# Decodes for every VideoStream share these workers instead of a thread per camera.
+# Workers start lazily from the pinned stream readers, so they reset their affinity.
+DECODE_POOL = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix="jpeg-decode",
+                                 initializer=unpin_thread)
+
+
+def open_stream(url, timeout=10):
+    """Send a plain GET for url, return (socket, status, lowercased headers, first body bytes)"""
+    parts = urlsplit(url)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    sock = socket.create_connection((parts.hostname, parts.port or 80), timeout=timeout)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, STREAM_RCVBUF)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # HTTP/1.0 and no keep-alive, the stream runs until either side closes
+        sock.sendall(f"GET {path} HTTP/1.0\r\nHost: {parts.netloc}\r\n\r\n".encode('latin-1'))
+        head = bytearray()
+        end = -1
+        while end == -1:
+            chunk = sock.recv(4096)
+            if not chunk:
+                raise ConnectionError("Connection closed before the response headers")
+            head += chunk
+            end = head.find(b'\r\n\r\n')
+            if end == -1 and len(head) > 65536:
+                raise ConnectionError("Response headers too long")
+        lines = head[:end].decode('latin-1').split('\r\n')
+        status = int(lines[0].split()[1])
+        headers = {}
+        for line in lines[1:]:
+            key, _, value = line.partition(':')
+            headers[key.strip().lower()] = value.strip()
+        return sock, status, headers, head[end + 4:]
+    except Exception:
+        sock.close()
+        raise
+
+
 class VideoStream:
-    def __init__(self, url):
+    def __init__(self, url, use_nvjpeg=USE_NVJPEG, chunk_size=STREAM_CHUNK_SIZE,
+                 downscale=STREAM_DOWNSCALE, fast_dct=FAST_JPEG_DCT, grayscale=STREAM_GRAYSCALE,
+                 cpu=None):
+        if downscale not in DECODE_FLAGS:
+            raise ValueError(f"downscale must be one of {list(DECODE_FLAGS)}, got {downscale}")
         self.url = url
+        self.cpu = cpu  # core for the reader thread, None leaves it unpinned
+        self.chunk_size = chunk_size
+        self.downscale = downscale
+        self.grayscale = grayscale
+        self.decode_flag = (GRAY_DECODE_FLAGS if grayscale else DECODE_FLAGS)[downscale]
+        self.turbo = None
+        if fast_dct and TurboJPEG is not None:
+            try:
+                self.turbo = TurboJPEG()
+            except (OSError, RuntimeError):  # libturbojpeg itself isn't installed
+                self.turbo = None
+        # NVJPEG always decodes full size BGR, reduced and grayscale decoding happen in libjpeg
+        self.use_nvjpeg = (use_nvjpeg and downscale == 1 and not grayscale and decode_jpeg is not None
+                           and torch.cuda.is_available())
         self._run_flag = False
+        self.stop_event = threading.Event()  # wakes the reconnect backoff on stop()
         self.thread = None
-        self.frame = None
-        self.lock = threading.Lock()
-        self.last_frame_time = time.time()
+        # Newest undecoded JPEG; at most one decode per stream is in flight on DECODE_POOL
+        # and a newer JPEG simply replaces one that is still waiting
+        self.pending_jpeg = None
+        self.decoding = False
+        self.decode_lock = threading.Lock()
+        self.overflows = 0  # buffer drops since the last overflow warning
+        self.last_overflow_log = 0.0
+        # (frame, frame_id, receive time) replaced as a whole, a single attribute store is
+        # atomic so readers take a consistent snapshot without locking
+        self.latest = (None, 0, time.monotonic())
+        self.new_frame = threading.Condition()  # only for read_next() to sleep on
         self.logger = Logger("VideoStream")
 
     def start(self):
         if not self._run_flag:
             self._run_flag = True
+            self.stop_event.clear()
             self.thread = threading.Thread(target=self._run, args=())
             self.thread.daemon = True  # Make thread daemon
             self.thread.start()
             self.logger.log("Video stream thread started")
+            decoder = 'NVJPEG' if self.use_nvjpeg else 'TurboJPEG' if self.turbo else 'OpenCV'
+            self.logger.log(f"JPEG decoder: {decoder}{' (grayscale)' if self.grayscale else ''}")
+            # Without libjpeg-turbo's NEON paths imdecode is several times slower on the Orin
+            jpeg_library = opencv_jpeg_library()
+            if "turbo" not in jpeg_library:
+                self.logger.log(f"OpenCV JPEG library is {jpeg_library}, rebuild OpenCV "
+                                f"against libjpeg-turbo for faster decoding", "WARNING")
+
+    def _decode(self, jpg):
+        """Decode a JPEG byte view to a BGR frame, on NVJPEG or TurboJPEG when enabled"""
+        if self.use_nvjpeg:
+            try:
+                rgb = decode_jpeg(torch.from_numpy(jpg), device="cuda")
+                # Download straight into page-locked memory, torch's host allocator recycles
+                # these blocks once the previous frames are released
+                frame = torch.empty((rgb.shape[1], rgb.shape[2], 3), dtype=torch.uint8, pin_memory=True)
+                frame.copy_(rgb.flip(0).permute(1, 2, 0))
+                return frame.numpy()
+            except RuntimeError as e:
+                self.logger.log(f"NVJPEG decode failed, switching to OpenCV: {e}", "WARNING")
+                self.use_nvjpeg = False
+        if self.turbo is not None:
+            try:
+                # Fast integer IDCT and upsampling, the detector doesn't see the rounding
+                frame = self.turbo.decode(jpg, pixel_format=TJPF_GRAY if self.grayscale else TJPF_BGR,
+                                          scaling_factor=(1, self.downscale),
+                                          flags=TJFLAG_FASTDCT | TJFLAG_FASTUPSAMPLE)
+                # Match imdecode's single channel HxW shape
+                return frame[..., 0] if self.grayscale else frame
+            except OSError:
+                pass  # Let OpenCV try the frame
+        return cv2.imdecode(jpg, self.decode_flag)
+
+    def _submit(self, buf: bytearray, start: int, end: int):
+        """Queue buf[start:end] for decoding, replacing a JPEG that hasn't been picked up yet"""
+        with self.decode_lock:
+            self.pending_jpeg = (buf, start, end)
+            if self.decoding:
+                return
+            self.decoding = True
+        # Decoding runs beside the network reads, imdecode releases the GIL
+        DECODE_POOL.submit(self._decode_pending)
+
+    def _decode_pending(self):
+        """Pool task: decode and publish pending JPEGs until none is left"""
+        while True:
+            with self.decode_lock:
+                pending, self.pending_jpeg = self.pending_jpeg, None
+                if pending is None:
+                    self.decoding = False
+                    return
+            buf, start, end = pending
+            try:
+                # A view into the reader's old buffer, the JPEG bytes are never copied
+                frame = self._decode(np.frombuffer(buf, dtype=np.uint8, count=end - start, offset=start))
+            except Exception as e:  # keep the task alive, otherwise this stream stops decoding
+                self.logger.log(f"Decode error: {e}", "ERROR")
+                continue
+            if frame is not None:
+                self.latest = (frame, self.latest[1] + 1, time.monotonic())
+                with self.new_frame:
+                    self.new_frame.notify_all()
+                # logging.debug("Frame received and processed")
+            else:
+                self.logger.log("Received empty frame", "WARNING")
+
+    def _log_overflow(self):
+        """Count a buffer drop, warning at most every 10 seconds"""
+        self.overflows += 1
+        now = time.monotonic()
+        if now - self.last_overflow_log >= 10:
+            self.logger.log(f"Stream buffer passed {STREAM_MAX_BUFFER} bytes without a complete frame, "
+                            f"dropped it {self.overflows} time(s)", "WARNING")
+            self.overflows = 0
+            self.last_overflow_log = now
 
     def _run(self):
+        pin_thread(self.logger, self.cpu)
+        delay = 1
         try:
-            self.logger.log(f"Connecting to stream URL: {self.url}")
-            with requests.get(self.url, stream=True, timeout=10) as r:
-                if r.status_code != 200:
-                    self.logger.log(f"Failed to connect to stream. Status code: {r.status_code}", "ERROR")
-                    return
-
-                self.logger.log("Connected to stream successfully")
-                bytes_buffer = bytes()
-
-                for chunk in r.iter_content(chunk_size=1024):
-                    if not self._run_flag:
-                        break
-                    bytes_buffer += chunk
-                    a = bytes_buffer.find(b'\xff\xd8')
-                    b = bytes_buffer.find(b'\xff\xd9')
-                    if a != -1 and b != -1:
-                        jpg = bytes_buffer[a:b + 2]
-                        bytes_buffer = bytes_buffer[b + 2:]
-                        frame = cv2.imdecode(np.frombuffer(jpg, dtype=np.uint8), cv2.IMREAD_COLOR)
-                        if frame is not None:
-                            with self.lock:
-                                self.frame = frame
-                                self.last_frame_time = time.time()
-                            # logging.debug("Frame received and processed")
-                        else:
-                            self.logger.log("Received empty frame", "WARNING")
-        except requests.RequestException as e:
-            self.logger.log(f"Network error: {str(e)}", "ERROR")
-        except Exception as e:
-            self.logger.log(f"Error in video stream: {str(e)}", "ERROR")
+            while self._run_flag:
+                try:
+                    if self._stream():
+                        delay = 1  # Got frames, so start backing off from scratch next time
+                except (OSError, ValueError, IndexError) as e:  # socket errors or a malformed response
+                    self.logger.log(f"Network error: {str(e)}", "ERROR")
+                except Exception as e:
+                    self.logger.log(f"Error in video stream: {str(e)}", "ERROR")
+                if not self._run_flag:
+                    break
+                # Reconnect with exponential backoff instead of ending the thread
+                self.logger.log(f"Reconnecting in {delay}s", "WARNING")
+                if self.stop_event.wait(delay):
+                    break
+                delay = min(delay * 2, STREAM_MAX_BACKOFF)
         finally:
             self._run_flag = False
 
+    def _stream(self) -> bool:
+        """Read the stream until it ends or stop() is called, True if any frame arrived"""
+        self.logger.log(f"Connecting to stream URL: {self.url}")
+        got_frame = False
+        sock, status, headers, body = open_stream(self.url)
+        with sock:
+            if status != 200:
+                self.logger.log(f"Failed to connect to stream. Status code: {status}", "ERROR")
+                return False
+
+            self.logger.log("Connected to stream successfully")
+            # Werkzeug frames the body with chunked transfer encoding even for HTTP/1.0
+            parser = StreamParser(headers.get('content-type', ''), headers.get('transfer-encoding', ''),
+                                  STREAM_MAX_BUFFER)
+            framed, drops = parser.framed, 0
+            # Reused receive buffer, recv_into() fills it without allocating per read
+            chunk = bytearray(self.chunk_size)
+            view = memoryview(chunk)
+
+            data = memoryview(body)
+            while True:
+                span = parser.feed(data)
+                if span is not None:
+                    self._submit(*span)
+                    got_frame = True
+                if framed and not parser.framed:
+                    self.logger.log("Stream parts have no Content-Length, scanning for JPEG markers")
+                    framed = False
+                if parser.drops != drops:
+                    drops = parser.drops
+                    self._log_overflow()
+                # Frames that came in with the terminating chunk are parsed above first
+                if parser.ended or not self._run_flag:
+                    break
+                n = sock.recv_into(view)
+                if not n:
+                    break
+                data = view[:n]
+        if self._run_flag:
+            self.logger.log("Stream ended", "WARNING")
+        return got_frame
+
+    # Frames are returned without a copy: every decode publishes a fresh array and the
+    # stream thread never writes to it again, so callers get it read-only and must copy
+    # before drawing on it.
     def read(self):
-        with self.lock:
-            if self.frame is None:
-                return False, None
-            if time.time() - self.last_frame_time > 5:
-                return False, None
-            return True, self.frame.copy()
+        frame, _, frame_time = self.latest
+        if frame is None:
+            return False, None
+        if time.monotonic() - frame_time > 5:
+            return False, None
+        return True, frame
+
+    def read_next(self, last_id, timeout=1.0):
+        """Wait for a frame newer than last_id and return (ret, frame, frame_id)"""
+        # Only block when the newest frame has already been seen
+        if self.latest[1] == last_id:
+            with self.new_frame:
+                if not self.new_frame.wait_for(lambda: self.latest[1] != last_id, timeout):
+                    return False, None, last_id
+        frame, frame_id, frame_time = self.latest
+        if time.monotonic() - frame_time > 5:
+            return False, None, last_id
+        return True, frame, frame_id
 
     def stop(self):
         self._run_flag = False
+        self.stop_event.set()
         if self.thread and self.thread.is_alive():
             self.thread.join(timeout=5)  # Add timeout
             if self.thread.is_alive():
@@ -97,25 +362,34 @@ def load_model(config_file):
     return None
 
 
+CMD_ON = 'ON\n'
+CMD_OFF = 'OFF\n'
+
+
 class ArduinoController:
     def __init__(self, port: str = '/dev/ttyACM0', baudrate: int = 9600):
         self.logger = Logger("Arduino")
         self.port = port
         self.baudrate = baudrate
-        self.arduino = None
+        self.arduino: Optional[serial.Serial] = None
         self.last_command_time = time.time()
         self.running = True
         self.command_count = {'ON': 0, 'OFF': 0}
         self.last_status_time = time.time()
         self.status_interval = 60
         self.time_delay = 3  # delay time to send command to Arduino
+        self.write_timeout = 0.05  # longest a command waits for room in the serial buffer
+        self.selector = selectors.DefaultSelector()  # waits for room in the serial buffer
 
     def connect(self) -> bool:
         retry_count = 0
         max_retries = 3
         while retry_count < max_retries:
             try:
-                self.arduino = serial.Serial(self.port, self.baudrate)
+                # Non-blocking port: writes go through _write() which waits on the fd itself
+                arduino = serial.Serial(self.port, self.baudrate, timeout=0, write_timeout=0)
+                self.selector.register(arduino.fd, selectors.EVENT_WRITE)
+                self.arduino = arduino
                 self.logger.log(f"Connected to Arduino on {self.port}")
                 return True
             except Exception as e:
@@ -126,9 +400,24 @@ class ArduinoController:
         self.logger.log("Failed to connect to Arduino after all retries", "ERROR")
         return False
 
+    def _write(self, data: bytes):
+        """Write all of data, sleeping on the selector only while the serial buffer is full"""
+        arduino = self.arduino
+        if arduino is None:
+            raise serial.SerialException("Arduino is not connected")
+        view = memoryview(data)
+        deadline = time.time() + self.write_timeout
+        while view:
+            try:
+                view = view[os.write(arduino.fd, view):]
+            except BlockingIOError:
+                remaining = deadline - time.time()
+                if remaining <= 0 or not self.selector.select(remaining):
+                    raise serial.SerialTimeoutException("Write timeout")
+
     def send_command(self, command: str) -> bool:
         try:
-            self.arduino.write(command.encode())
+            self._write(command.encode())
             self.command_count[command.strip()] += 1
             return True
         except Exception as e:
@@ -142,36 +431,43 @@ class ArduinoController:
                             f"OFF commands: {self.command_count['OFF']}")
             self.last_status_time = current_time
 
-    def process_commands(self, command_queue: queue.Queue):
+    def process_commands(self, command_queue: CommandQueue):
+        pin_thread(self.logger, ARDUINO_CPU, ARDUINO_NICE)
         if not self.connect():
             return
 
         try:
             while self.running:
                 try:
-                    commands = []
-                    update_queue_time = time.time()
-                    while time.time() - update_queue_time < self.time_delay:
+                    # Block on the queue until the window closes instead of polling it
+                    on_count = off_count = 0
+                    saw_any = False
+                    deadline = time.time() + self.time_delay
+                    while True:
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            break
                         try:
-                            cmd = command_queue.get_nowait()
-                            if cmd is None:
-                                self.running = False
-                                break
-                            commands.append(cmd)
+                            cmd = command_queue.get(timeout=remaining)
                         except queue.Empty:
-                            time.sleep(0.1)
-                            continue
+                            break
+                        if cmd is None:
+                            self.running = False
+                            break
+                        if cmd == CMD_ON:
+                            on_count += 1
+                        else:
+                            off_count += 1
+                        saw_any = True
 
                     if not self.running:
                         break
 
-                    if commands and (time.time() - self.last_command_time >= self.time_delay):
-                        on_count = commands.count('ON\n')
-                        off_count = commands.count('OFF\n')
+                    if saw_any and (time.time() - self.last_command_time >= self.time_delay):
                         if on_count > off_count:
-                            if self.send_command('ON\n'):
+                            if self.send_command(CMD_ON):
                                 time.sleep(1)
-                                self.send_command('OFF\n')
+                                self.send_command(CMD_OFF)
                         self.last_command_time = time.time()
 
                 except Exception as e:
@@ -183,7 +479,8 @@ class ArduinoController:
     def cleanup(self):
         try:
             if self.arduino:
-                self.send_command('OFF\n')
+                self.send_command(CMD_OFF)
+                self.selector.close()
                 self.arduino.close()
                 self.logger.log("Arduino connection closed")
                 self.logger.log(f"Final stats - ON: {self.command_count['ON']}, "
@@ -192,7 +489,55 @@ class ArduinoController:
             self.logger.log(f"Error during cleanup: {e}", "ERROR")
 
 
+class DisplayThread(threading.Thread):
+    """Draws detections and shows frames so the GUI never blocks the detection loop"""
+
+    def __init__(self, stop_event: threading.Event, window: str = 'Pear Detection'):
+        super().__init__(daemon=True)
+        self.frames: queue.Queue[Tuple[np.ndarray, int, np.ndarray]] = queue.Queue(maxsize=1)
+        self.stop_event = stop_event
+        self.window = window
+        self.logger = Logger("Display")
+
+    def show(self, frame, result, boxes):
+        """Queue a frame for display, replacing one that hasn't been shown yet"""
+        try:
+            self.frames.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            self.frames.put_nowait((frame, result, boxes))
+        except queue.Full:
+            pass
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                frame, result, boxes = self.frames.get(timeout=0.1)
+            except queue.Empty:
+                frame = None
+
+            if frame is not None:
+                # Stream frames are shared read-only, draw on a copy
+                frame = frame.copy()
+                for box in boxes:
+                    x1, y1, x2, y2 = map(int, box[:4])
+                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+
+                cv2.putText(frame,
+                            f"Result: {'Normal' if result == 0 else 'Abnormal'}",
+                            (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+
+                cv2.imshow(self.window, frame)
+
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                self.logger.log("Quit signal received")
+                self.stop_event.set()
+        cv2.destroyAllWindows()
+
+
 def main():
+    line_buffered_stdout()
     logger = Logger("Main")
     logger.log("Starting Pear Detection System")
 
@@ -200,9 +545,13 @@ def main():
         # load model and initialize components
         model = load_model(YOLO_CONFIG_FILE)
         url = f"http://{RASPBERRY_IP}:5000/api/video_feed/{CAMERA_ORDER}"  # Replace with your server's URL
-        video_stream = VideoStream(url)
+        video_stream = VideoStream(url, cpu=STREAM_CPUS[0] if STREAM_CPUS else None)
         video_stream.start()
-        command_queue = queue.Queue()
+        command_queue = CommandQueue()
+
+        stop_event = threading.Event()
+        display = DisplayThread(stop_event)
+        display.start()
 
         # Start Arduino thread
         arduino_controller = ArduinoController()
@@ -212,32 +561,33 @@ def main():
         )
         arduino_thread.start()
         logger.log("Arduino thread started")
-        while True:
-            ret, frame = video_stream.read()
+
+        # Batch frames into one predict() call, capped so a batch spans at most MAX_BATCH_LATENCY
+        batch_size = max(1, min(model.batch, int(STREAM_FPS * MAX_BATCH_LATENCY)))
+        logger.log(f"Batch size: {batch_size}")
+        batch = []
+        frame_id = 0
+        while not stop_event.is_set():
+            ret, frame, frame_id = video_stream.read_next(frame_id)
             if not ret:
+                # read_next() already waited; frames from before the stall are stale now
                 logging.error("Could not read frame.")
-                time.sleep(1)  # Wait a bit before trying again
+                batch = []
                 continue
 
-            result, boxes = model.inference(frame)
-
-            # Send command
-            command_queue.put('ON\n' if result == 1 else 'OFF\n')
-
-            # Draw results
-            for box in boxes:
-                x1, y1, x2, y2 = map(int, box[:4])
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-
-            cv2.putText(frame,
-                        f"Result: {'Normal' if result == 0 else 'Abnormal'}",
-                        (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+            batch.append(frame)
+            if len(batch) < batch_size:
+                continue
+            outputs = model.inference(batch)
+            batch = []
 
-            cv2.imshow('Pear Detection', frame)
+            # Send commands
+            for result, _ in outputs:
+                command_queue.put(CMD_ON if result == 1 else CMD_OFF)
 
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                logger.log("Quit signal received")
-                break
+            # Show the newest frame of the batch, drawing happens on the display thread
+            result, boxes = outputs[-1]
+            display.show(frame, result, boxes)
     except KeyboardInterrupt:
         logging.info("Keyboard interrupt received. Stopping.")
     except Exception as e:
@@ -246,7 +596,8 @@ def main():
         # Cleanup
         logger.log("Cleaning up...")
         video_stream.stop()
-        cv2.destroyAllWindows()
+        stop_event.set()
+        display.join()
         command_queue.put(None)
         arduino_thread.join()
         logger.log("Cleanup complete")
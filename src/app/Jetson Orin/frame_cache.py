@@ -0,0 +1,54 @@
+from collections import deque
+from typing import Deque, Tuple
+
+import cv2
+import numpy as np
+from logger import Logger
+
+
+class FrameCache:
+    """Reuses the last output for frames nearly identical to a recently inferred one"""
+
+    def __init__(self, size: int = 4, max_distance: int = 8, refresh_interval: int = 30,
+                 log_interval: int = 300):
+        self.logger = Logger("FrameCache")
+        self.entries: Deque[Tuple[np.ndarray, Tuple[int, np.ndarray]]] = deque(maxlen=size)  # newest last
+        self.max_distance = max_distance
+        self.refresh_interval = refresh_interval
+        self.log_interval = log_interval
+        self.served_since_refresh = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def signature(img: np.ndarray) -> np.ndarray:
+        """256-bit average hash: 16x16 grayscale thumbnail thresholded at its mean"""
+        thumb = cv2.resize(img, (16, 16), interpolation=cv2.INTER_AREA)
+        if thumb.ndim == 3:
+            thumb = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+        return np.packbits(thumb > thumb.mean())
+
+    def lookup(self, signature: np.ndarray):
+        """Cached output for a similar frame, or None when inference must run"""
+        # Force a real inference every refresh_interval cached frames so state can't go stale
+        if self.served_since_refresh < self.refresh_interval:
+            for cached, output in reversed(self.entries):
+                if np.unpackbits(cached ^ signature).sum() <= self.max_distance:
+                    self.served_since_refresh += 1
+                    self._count(hit=True)
+                    return output
+        self._count(hit=False)
+        return None
+
+    def store(self, signature: np.ndarray, output) -> None:
+        self.entries.append((signature, output))
+        self.served_since_refresh = 0
+
+    def _count(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        total = self.hits + self.misses
+        if total % self.log_interval == 0:
+            self.logger.log(f"Hit rate: {self.hits / total:.1%} ({self.hits}/{total})")
@@ -2,21 +2,32 @@ import cv2
 import torch
 import yaml
 from ultralytics import YOLO
+from ultralytics.engine.results import Boxes
 import numpy as np
-from typing import Tuple
-import time
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
 import sys
 
+from frame_cache import FrameCache
+from logger import Logger, line_buffered_stdout
 
-class Logger:
-    def __init__(self, name: str):
-        self.name = name
-        self.start_time = time.time()
+try:
+    from numba import njit
+except ImportError:  # numba is optional, the filter below then runs as plain NumPy
+    def njit(*args, **kwargs):
+        return lambda func: func
 
-    def log(self, message: str, level: str = "INFO") -> None:
-        timestamp = time.time() - self.start_time
-        print(f"[{timestamp:.2f}s] {level} - {self.name}: {message}")
-        sys.stdout.flush()
+
+BURN_CLASS = "burn_bbox"
+BURN_CONF_THRESHOLD = 0.7  # models with a burn class
+DEFAULT_CONF_THRESHOLD = 0.9  # models without one
+
+
+@njit(cache=True)
+def _filter_and_classify(xyxy, cls, conf, target_id, threshold):
+    """Keep boxes above threshold and flag whether target_id is among them"""
+    mask = conf > threshold
+    return int((cls[mask] == target_id).any()), xyxy[mask]
 
 
 class PearDetectionModel:
@@ -27,38 +38,115 @@ class PearDetectionModel:
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.logger.log(f"Using device: {self.device}")
 
+        self.imgsz = config.get("imgsz", 640)
+        self.batch = config.get("batch", 1)
+        self.precision = config.get("precision", "int8")
+        model_path = self._resolve_model_path(config["model_path"])
+
         try:
-            self.model = YOLO(config["model_path"], task="detect")
+            self.model = YOLO(model_path, task="detect")
+            # Engines run at their export precision; the .pt fallback runs FP16 on CUDA
+            self.half = self.precision == "fp16"
+            if model_path.endswith(".pt"):
+                self.half = self.device.type == "cuda"
             self.names = config["classes"]
+            # Class ids are resolved once so per-frame filtering only compares numbers
+            if BURN_CLASS in self.names:
+                self.burn_id, self.conf_threshold = self.names.index(BURN_CLASS), BURN_CONF_THRESHOLD
+            else:
+                self.burn_id, self.conf_threshold = -1, DEFAULT_CONF_THRESHOLD
+            self.cache = (
+                FrameCache(
+                    max_distance=config.get("cache_max_distance", 8),
+                    refresh_interval=config.get("cache_refresh_interval", 30),
+                )
+                if config.get("frame_cache", False)
+                else None
+            )
+            # Compile the numba filter now instead of on the first real frame. Boxes hands over
+            # column views of its (n, 6) data, contiguous only for n < 2, so warm up both layouts.
+            for rows in (0, 2):
+                data = np.zeros((rows, 6), dtype=np.float32)
+                _filter_and_classify(data[:, :4], data[:, -1], data[:, -2], self.burn_id, self.conf_threshold)
             self.logger.log("Model loaded successfully")
             self.logger.log(f"Classes: {self.names}")
         except Exception as e:
             self.logger.log(f"Error loading model: {e}", "ERROR")
             raise
 
-    def detect(self, img: np.ndarray) -> np.ndarray:
+    def _resolve_model_path(self, model_path: str) -> str:
+        path = Path(model_path)
+        if path.suffix == ".engine" and not path.exists():
+            fallback = path.with_suffix(".pt")
+            self.logger.log(f"Engine {path} not found, falling back to {fallback}", "WARNING")
+            return str(fallback)
+        return model_path
+
+    def detect(self, imgs: List[np.ndarray]) -> List[Optional[Boxes]]:
         try:
-            results = self.model.predict(img)
-            return results[0].boxes.cpu().numpy()
+            # conf is the threshold _classify() applies, so NMS skips boxes it would drop
+            results = self.model.predict(
+                imgs, imgsz=self.imgsz, half=self.half, conf=self.conf_threshold, verbose=False
+            )
+            return [r.boxes.cpu().numpy() for r in results]
         except Exception as e:
             self.logger.log(f"Detection error: {e}", "ERROR")
-            return np.array([])
-
-    def inference(self, img: np.ndarray) -> Tuple[int, np.ndarray]:
-        pred = self.detect(img)
-
-        pred = (
-            pred[pred.conf > 0.9]
-            if all([pred != "burn_bbox" for pred in self.names])
-            else pred[pred.conf > 0.7]
+            return [None] * len(imgs)
+
+    def inference(self, img: Union[np.ndarray, List[np.ndarray]]):
+        """Return (result, boxes) for a BGR frame, or a list of them for a batch of frames"""
+        # Frames stay BGR as OpenCV decodes them, Ultralytics swaps channels in its own preprocess
+        # A batch goes through a single predict() call to amortize dispatch overhead
+        if isinstance(img, list):
+            return self._infer_batch(img)
+        return self._infer_batch([img])[0]
+
+    def _infer_batch(self, imgs: List[np.ndarray]) -> List[Tuple[int, np.ndarray]]:
+        if self.cache is None:
+            return [self._classify(boxes) for boxes in self.detect(imgs)]
+
+        # Only frames that differ from recent ones reach the model
+        signatures = [FrameCache.signature(img) for img in imgs]
+        outputs = [self.cache.lookup(signature) for signature in signatures]
+        misses = [i for i, output in enumerate(outputs) if output is None]
+        if misses:
+            for i, boxes in zip(misses, self.detect([imgs[i] for i in misses])):
+                outputs[i] = self._classify(boxes)
+                if boxes is not None:  # a failed detect() must not be served again
+                    self.cache.store(signatures[i], outputs[i])
+        return outputs
+
+    def _classify(self, boxes: Optional[Boxes]) -> Tuple[int, np.ndarray]:
+        if boxes is None:
+            return 0, np.empty((0, 4), dtype=np.float32)
+
+        # Single confidence mask over the raw arrays, 1 if a burn is detected, 0 otherwise
+        result, xyxy = _filter_and_classify(
+            boxes.xyxy, boxes.cls, boxes.conf, self.burn_id, self.conf_threshold
         )
-        labels = [self.names[int(cat)] for cat in pred.cls]
-
-        # if any classes rather than "normal_pear_box" is detected, return 0 else return 1
-        if any([label == "burn_bbox" for label in labels]):
-            return 1, pred.xyxy
-        else:
-            return 0, pred.xyxy
+        return result, xyxy
+
+
+def export_engine(config) -> str:
+    """Export the .pt checkpoint to a TensorRT engine at the configured precision"""
+    precision = config.get("precision", "int8")
+    if precision == "int8":
+        # TensorRT calibrates on the calib_data images and caches the table
+        quantization = {"int8": True, "data": config["calib_data"]}
+    elif precision == "fp16":
+        quantization = {"half": True}
+    else:
+        raise ValueError(f"Unsupported precision: {precision}")
+    model = YOLO(str(Path(config["model_path"]).with_suffix(".pt")), task="detect")
+    # Dynamic batch up to `batch` so both full batches and single frames fit the engine
+    return model.export(
+        format="engine",
+        imgsz=config.get("imgsz", 640),
+        batch=config.get("batch", 1),
+        dynamic=config.get("batch", 1) > 1,
+        workspace=4,
+        **quantization,
+    )
 
 
 if __name__ == "__main__":
@@ -67,16 +155,22 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--config", type=str, default="yolo_config.yml")
     parser.add_argument("--img_path", type=str, default="Real_pear")
+    parser.add_argument("--export", action="store_true",
+                        help="export the .pt checkpoint to a TensorRT engine and exit")
     args = parser.parse_args()
+    line_buffered_stdout()
 
     with open(args.config) as f:
         config = yaml.safe_load(f)
 
+    if args.export:
+        print(f"Exported engine: {export_engine(config)}")
+        sys.exit()
+
     model = PearDetectionModel(config)
     while True:
         img = cv2.imread(args.img_path)
         if img is None:
             print(f"Error: Could not read image from {args.img_path}")
             break
-        # img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
         print(model.inference(img))
@@ -0,0 +1,24 @@
+import os
+import sys
+import time
+
+LOG_LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+MIN_LOG_LEVEL = LOG_LEVELS.get(os.environ.get("PEAR_LOG_LEVEL", "INFO").upper(), LOG_LEVELS["INFO"])
+
+
+class Logger:
+    def __init__(self, name: str):
+        self.name = name
+        self.start_time = time.monotonic()
+
+    def log(self, message: str, level: str = "INFO") -> None:
+        if LOG_LEVELS.get(level, MIN_LOG_LEVEL) < MIN_LOG_LEVEL:
+            return
+        timestamp = time.monotonic() - self.start_time
+        print(f"[{timestamp:.2f}s] {level} - {self.name}: {message}")
+
+
+def line_buffered_stdout() -> None:
+    """Make stdout flush at every newline, so log lines appear at once even when piped"""
+    if hasattr(sys.stdout, "reconfigure"):
+        sys.stdout.reconfigure(line_buffering=True)
@@ -0,0 +1,146 @@
+import re
+from typing import Optional, Tuple
+
+SOI = b'\xff\xd8'  # JPEG start of image
+EOI = b'\xff\xd9'  # JPEG end of image
+CONTENT_LENGTH = re.compile(rb'content-length:\s*(\d+)', re.IGNORECASE)
+# Chunked transfer size line, preceded by the CRLF closing the previous chunk
+CHUNK_HEADER = re.compile(rb'(?:\r\n)?([0-9A-Fa-f]+)[^\r\n]*\r\n')
+
+
+def part_delimiter(content_type: str) -> Optional[bytes]:
+    """Multipart delimiter line (b'--' + boundary) from a Content-Type header, or None"""
+    for param in content_type.split(';')[1:]:
+        key, _, value = param.strip().partition('=')
+        if key.lower() == 'boundary' and value:
+            return b'--' + value.strip('"').encode()
+    return None
+
+
+def split_by_length(buf: bytearray, delimiter: bytes):
+    """Return (newest complete JPEG span, bytes consumed) from Content-Length framed parts,
+    or None when a part doesn't advertise its length"""
+    last, pos = None, 0
+    while True:
+        # Anything before the delimiter is a preamble or, after a resync, the rest of a
+        # dropped payload, so it is skipped rather than parsed as a header
+        part = buf.find(delimiter, pos)
+        if part == -1:
+            return last, max(pos, len(buf) - len(delimiter) + 1)
+        header_end = buf.find(b'\r\n\r\n', part)
+        if header_end == -1:
+            return last, part
+        match = CONTENT_LENGTH.search(buf, part, header_end)
+        if match is None:
+            return None
+        start = header_end + 4
+        end = start + int(match.group(1))
+        if end > len(buf):
+            return last, part
+        # Skip whole frames by their length, the payload itself is never scanned
+        last, pos = (start, end), end
+
+
+def split_by_markers(buf: bytearray, start: int):
+    """Return (newest complete JPEG span, bytes consumed) by scanning for JPEG markers"""
+    # Jump straight to the newest complete JPEG, older ones in the buffer would be
+    # overwritten before the detector could read them so they aren't decoded
+    last, consumed = None, 0
+    eoi = buf.rfind(EOI, start)
+    if eoi != -1:
+        soi = buf.rfind(SOI, 0, eoi)
+        if soi != -1:
+            last = (soi, eoi + 2)
+        consumed = eoi + 2
+    # Drop everything before the next start marker, so a pending frame begins at offset 0
+    soi = buf.find(SOI, consumed)
+    return last, soi if soi != -1 else max(consumed, len(buf) - 1)
+
+
+def dechunk(buf: bytearray, pos: int, left: int):
+    """Strip chunked transfer framing from buf[pos:] in place, return (end of the payload,
+    bytes left in the current chunk), or left None once the last chunk arrived"""
+    while pos < len(buf):
+        if left:
+            step = min(left, len(buf) - pos)
+            pos += step
+            left -= step
+            continue
+        match = CHUNK_HEADER.match(buf, pos)
+        if match is None:
+            if buf.find(b'\n', pos + 2) == -1 and len(buf) - pos < 1024:
+                break  # Size line split across reads
+            raise ValueError("Malformed chunked stream")
+        left = int(match.group(1), 16)
+        del buf[pos:match.end()]
+        if left == 0:
+            return pos, None
+    return pos, left
+
+
+class StreamParser:
+    """Incremental MJPEG body parser: strips chunked framing, then splits out JPEGs by
+    their multipart Content-Length or, failing that, by JPEG markers"""
+
+    def __init__(self, content_type: str = '', transfer_encoding: str = '',
+                 max_buffer: int = 4 * 1024 * 1024):
+        self.delimiter = part_delimiter(content_type) or b''
+        self.framed = bool(self.delimiter)
+        self.chunked = 'chunked' in transfer_encoding.lower()
+        self.max_buffer = max_buffer
+        self.buf = bytearray()
+        self.scanned = 0  # bytes of buf already searched for markers
+        self.payload_end = 0  # end of the de-chunked part of buf
+        self.chunk_left = 0
+        self.ended = False  # the terminating chunk arrived
+        self.drops = 0  # times buf passed max_buffer without a complete frame
+
+    def feed(self, data) -> Optional[Tuple[bytearray, int, int]]:
+        """Add received bytes, return (buffer, start, end) of the newest complete JPEG or None;
+        the returned buffer is never written to again"""
+        if self.ended:
+            return None  # Only trailers follow the terminating chunk
+        buf = self.buf
+        buf += data
+        framing = bytearray()
+        if self.chunked:
+            self.payload_end, left = dechunk(buf, self.payload_end, self.chunk_left)
+            self.ended = left is None
+            self.chunk_left = left or 0
+            # Hold back a partial size line so only JPEG payload gets parsed
+            framing = buf[self.payload_end:]
+            del buf[self.payload_end:]
+
+        parts = split_by_length(buf, self.delimiter) if self.framed else None
+        if parts is None:
+            if self.framed:
+                self.framed = False
+                self.scanned = 0  # Nothing was marker-scanned while framing by length
+            # Only scan the new tail; step back one byte for a marker split across reads
+            parts = split_by_markers(buf, max(0, self.scanned - 1))
+        last, consumed = parts
+
+        span = None
+        if last is not None:
+            # Hand buf itself over and carry only the unconsumed tail on, which is
+            # shorter than the frame a slice would have copied
+            span = (buf, *last)
+            buf = buf[consumed:]
+        else:
+            del buf[:consumed]
+        self.scanned = len(buf)
+
+        if len(buf) > self.max_buffer:
+            # No complete frame within the watermark: corrupt data or a lost boundary,
+            # so drop through to the next frame start instead of growing forever
+            marker = self.delimiter if self.framed else SOI
+            first = buf.find(marker)
+            resync = buf.find(marker, first + 1) if first != -1 else -1
+            del buf[:resync if resync != -1 else max(0, len(buf) - len(marker) + 1)]
+            self.scanned = 0
+            self.drops += 1
+        if self.chunked and not self.ended:
+            self.payload_end = len(buf)
+            buf += framing
+        self.buf = buf
+        return span
@@ -3,6 +3,7 @@
 from flask import Flask, Response, request, stream_with_context
 
 import cv2
+import numpy as np
 
 
 app = Flask(__name__)
@@ -12,24 +13,37 @@ PORT = 5000
 CACHE_TIME = 2
 PROC_CACHE = 30
 DEFAULT_RESOLUTION = (1920, 1080)
+JPEG_QUALITY = 80  # baseline JPEG, the Orin decodes it on NVJPEG which has no progressive support
+ENCODE_PARAMS = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY]
+# Content-Length lets clients take each frame by size instead of scanning for JPEG markers
+PART_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n'
+SLICE_SIZE = 16 * 1024  # bytes per write, so the first part of a frame leaves before the rest
 
 
 def generate_video_stream(camera_id=0, resolution=DEFAULT_RESOLUTION):
     camera = cv2.VideoCapture(camera_id)  # Open default camera
     camera.set(cv2.CAP_PROP_FRAME_WIDTH, resolution[0])
     camera.set(cv2.CAP_PROP_FRAME_HEIGHT, resolution[1])
+    # Check once whether the camera honoured the resolution instead of on every frame
+    actual = (int(camera.get(cv2.CAP_PROP_FRAME_WIDTH)), int(camera.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    needs_resize = actual != tuple(resolution)
+    if needs_resize:
+        print(f"Camera {camera_id} delivers {actual[0]}x{actual[1]}, resizing to {resolution[0]}x{resolution[1]}")
+        resized = np.empty((resolution[1], resolution[0], 3), dtype=np.uint8)
     try:
         while True:
             success, frame = camera.read()
             if not success:
                 break
             # Resize the frame if it doesn't match the desired resolution
-            if frame.shape[1] != resolution[0] or frame.shape[0] != resolution[1]:
-                frame = cv2.resize(frame, resolution)
-            ret, buffer = cv2.imencode('.jpg', frame)
-            frame = buffer.tobytes()
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+            if needs_resize:
+                frame = cv2.resize(frame, resolution, dst=resized, interpolation=cv2.INTER_AREA)
+            ret, buffer = cv2.imencode('.jpg', frame, ENCODE_PARAMS)
+            jpeg = buffer.tobytes()
+            yield PART_HEADER % len(jpeg)
+            for start in range(0, len(jpeg), SLICE_SIZE):
+                yield jpeg[start:start + SLICE_SIZE]
+            yield b'\r\n'
     finally:
         camera.release()
 
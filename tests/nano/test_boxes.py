@@ -0,0 +1,47 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src" / "app" / "Jetson Nano"))
+
+from utils import filter_contained  # noqa: E402
+
+FRUIT, DEFECT = 0, 1
+
+
+def boxes(*rows):
+    xyxy = np.array([row[:4] for row in rows], dtype=np.float32).reshape(-1, 4)
+    cls = np.array([row[4] for row in rows], dtype=np.float32)
+    return xyxy, cls
+
+
+def test_keeps_defect_inside_fruit():
+    xyxy, cls = boxes((100, 100, 200, 200, FRUIT), (120, 120, 150, 150, DEFECT))
+    _, kept = filter_contained(xyxy, cls, DEFECT, FRUIT)
+    assert list(kept) == [FRUIT, DEFECT]
+
+
+def test_drops_defect_outside_every_fruit():
+    xyxy, cls = boxes((100, 100, 200, 200, FRUIT), (300, 300, 330, 330, DEFECT))
+    kept_xyxy, kept = filter_contained(xyxy, cls, DEFECT, FRUIT, margin=16)
+    assert list(kept) == [FRUIT]
+    assert kept_xyxy.shape == (1, 4)
+
+
+def test_margin_keeps_defect_on_the_fruit_edge():
+    xyxy, cls = boxes((100, 100, 200, 200, FRUIT), (180, 120, 201, 150, DEFECT))
+    assert list(filter_contained(xyxy, cls, DEFECT, FRUIT)[1]) == [FRUIT]
+    assert list(filter_contained(xyxy, cls, DEFECT, FRUIT, margin=16)[1]) == [FRUIT, DEFECT]
+
+
+def test_defect_without_fruit_is_dropped():
+    xyxy, cls = boxes((10, 10, 20, 20, DEFECT))
+    kept_xyxy, kept = filter_contained(xyxy, cls, DEFECT, FRUIT, margin=16)
+    assert kept.size == 0 and kept_xyxy.shape == (0, 4)
+
+
+def test_no_boxes():
+    xyxy, cls = boxes()
+    kept_xyxy, kept = filter_contained(xyxy, cls, DEFECT, FRUIT)
+    assert kept.size == 0 and kept_xyxy.shape == (0, 4)
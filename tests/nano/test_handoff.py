@@ -0,0 +1,72 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src" / "app" / "Jetson Nano"))
+
+from utils import CommandVotes, FramePool, FrameSlot  # noqa: E402
+
+
+def test_frame_slot_keeps_only_the_newest_frame():
+    slot = FrameSlot()
+    first, second = np.zeros(1), np.ones(1)
+    assert slot.put(first) is None
+    assert slot.put(second) is first  # handed back so the caller can recycle it
+    assert slot.get(timeout=0) is second
+    assert slot.get(timeout=0.01) is None
+
+
+def test_frame_slot_get_times_out():
+    slot = FrameSlot()
+    start = time.monotonic()
+    assert slot.get(timeout=0.05) is None
+    assert time.monotonic() - start >= 0.05
+
+
+def test_frame_slot_put_wakes_a_blocked_get():
+    slot = FrameSlot()
+    frame = np.zeros(1)
+    timer = threading.Timer(0.05, slot.put, (frame,))
+    timer.start()
+    try:
+        assert slot.get(timeout=5) is frame
+    finally:
+        timer.cancel()
+
+
+def test_frame_pool_hands_out_each_buffer_once():
+    pool = FramePool((2, 2, 3), size=2)
+    a, b = pool.acquire(), pool.acquire()
+    assert a is not None and b is not None and a is not b
+    assert a.shape == (2, 2, 3) and a.dtype == np.uint8
+    assert pool.acquire() is None
+    pool.release(a)
+    assert pool.acquire() is a
+
+
+def test_frame_pool_ignores_foreign_buffers():
+    pool = FramePool((2, 2, 3), size=1)
+    buf = pool.acquire()
+    pool.release(None)
+    pool.release(np.empty((2, 2, 3), dtype=np.uint8))
+    assert pool.acquire() is None
+    pool.release(buf)
+    assert pool.acquire() is buf
+
+
+def test_command_votes_snapshot_and_reset():
+    votes = CommandVotes()
+    for result in (1, 0, 1):
+        votes.add(result)
+    assert votes.snapshot_and_reset() == (2, 1)
+    assert votes.snapshot_and_reset() == (0, 0)
+
+
+def test_command_votes_drop_oldest_when_full():
+    votes = CommandVotes(maxlen=2)
+    for result in (1, 0, 0):
+        votes.add(result)
+    assert votes.snapshot_and_reset() == (0, 2)
@@ -0,0 +1,58 @@
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src" / "app" / "Jetson Orin"))
+
+from command_queue import CommandQueue  # noqa: E402
+
+
+def test_fifo_and_get_nowait():
+    q = CommandQueue()
+    q.put('ON\n')
+    q.put('OFF\n')
+    assert q.get_nowait() == 'ON\n'
+    assert q.get(timeout=0) == 'OFF\n'
+    with pytest.raises(queue.Empty):
+        q.get_nowait()
+
+
+def test_get_times_out_when_empty():
+    q = CommandQueue()
+    start = time.monotonic()
+    with pytest.raises(queue.Empty):
+        q.get(timeout=0.05)
+    assert time.monotonic() - start >= 0.05
+
+
+def test_stale_ready_flag_does_not_end_the_wait_early():
+    q = CommandQueue()
+    q.put('ON\n')
+    q.get_nowait()  # leaves the ready event set with nothing queued
+    start = time.monotonic()
+    with pytest.raises(queue.Empty):
+        q.get(timeout=0.05)
+    assert time.monotonic() - start >= 0.05
+
+
+def test_put_wakes_a_blocked_get():
+    q = CommandQueue()
+    timer = threading.Timer(0.05, q.put, ('ON\n',))
+    timer.start()
+    try:
+        start = time.monotonic()
+        assert q.get(timeout=5) == 'ON\n'
+        assert time.monotonic() - start < 5
+    finally:
+        timer.cancel()
+
+
+def test_oldest_command_dropped_when_full():
+    q = CommandQueue(maxlen=2)
+    for cmd in ('a', 'b', 'c'):
+        q.put(cmd)
+    assert [q.get_nowait(), q.get_nowait()] == ['b', 'c']
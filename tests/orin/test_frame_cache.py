@@ -0,0 +1,65 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src" / "app" / "Jetson Orin"))
+
+from frame_cache import FrameCache  # noqa: E402
+
+OUTPUT = (1, np.zeros((1, 4), dtype=np.float32))
+
+
+def signature_with_bits(bits: int) -> np.ndarray:
+    """256-bit signature with the first `bits` bits set"""
+    flags = np.zeros(256, dtype=bool)
+    flags[:bits] = True
+    return np.packbits(flags)
+
+
+def test_signature_is_stable_for_the_same_frame():
+    frame = np.random.default_rng(0).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+    assert np.array_equal(FrameCache.signature(frame), FrameCache.signature(frame.copy()))
+    assert FrameCache.signature(frame).shape == (32,)
+    assert FrameCache.signature(frame[..., 0]).shape == (32,)
+
+
+def test_hit_within_max_distance():
+    cache = FrameCache(max_distance=8)
+    cache.store(signature_with_bits(0), OUTPUT)
+    assert cache.lookup(signature_with_bits(8)) is OUTPUT
+
+
+def test_miss_beyond_max_distance():
+    cache = FrameCache(max_distance=8)
+    cache.store(signature_with_bits(0), OUTPUT)
+    assert cache.lookup(signature_with_bits(9)) is None
+
+
+def test_refresh_forced_after_interval():
+    cache = FrameCache(refresh_interval=2)
+    signature = signature_with_bits(0)
+    cache.store(signature, OUTPUT)
+    assert cache.lookup(signature) is OUTPUT
+    assert cache.lookup(signature) is OUTPUT
+    assert cache.lookup(signature) is None  # two cached frames served, run the model
+    cache.store(signature, OUTPUT)
+    assert cache.lookup(signature) is OUTPUT
+
+
+def test_failed_detection_is_not_cached():
+    pytest.importorskip("ultralytics")
+    from inference import PearDetectionModel
+
+    model = PearDetectionModel.__new__(PearDetectionModel)
+    model.cache = FrameCache()
+    model.burn_id, model.conf_threshold = 0, 0.7
+    model.detect = lambda imgs: [None] * len(imgs)
+    frame = np.zeros((64, 64, 3), dtype=np.uint8)
+
+    result, boxes = model.inference(frame)
+    assert result == 0 and boxes.shape == (0, 4)
+    assert len(model.cache.entries) == 0
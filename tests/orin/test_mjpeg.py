@@ -0,0 +1,130 @@
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src" / "app" / "Jetson Orin"))
+
+from mjpeg import EOI, SOI, StreamParser, dechunk, part_delimiter  # noqa: E402
+
+CONTENT_TYPE = 'multipart/x-mixed-replace; boundary=frame'
+
+
+def fake_jpeg(rng: random.Random, size: int) -> bytes:
+    # 0xff only appears in the markers, so the payload never fakes a SOI/EOI
+    return SOI + bytes(rng.randrange(0xff) for _ in range(size)) + EOI
+
+
+def multipart(frames, content_length: bool = True) -> bytes:
+    parts = []
+    for frame in frames:
+        header = b'--frame\r\nContent-Type: image/jpeg\r\n'
+        if content_length:
+            header += b'Content-Length: %d\r\n' % len(frame)
+        parts.append(header + b'\r\n' + frame + b'\r\n')
+    return b''.join(parts)
+
+
+def chunked(body: bytes, rng: random.Random) -> bytes:
+    out, pos = [], 0
+    while pos < len(body):
+        size = rng.randrange(1, 200)
+        out.append(b'%x;ext=1\r\n' % len(body[pos:pos + size]) + body[pos:pos + size] + b'\r\n')
+        pos += size
+    return b''.join(out) + b'0\r\n\r\n'
+
+
+def feed_in_pieces(parser: StreamParser, data: bytes, rng: random.Random, max_piece: int):
+    spans, pos = [], 0
+    while pos < len(data):
+        size = rng.randrange(1, max_piece + 1)
+        span = parser.feed(memoryview(data)[pos:pos + size])
+        pos += size
+        if span is not None:
+            spans.append(span)
+    # Compare at the end: buffers handed out must not have been written to since
+    return [bytes(buf[start:end]) for buf, start, end in spans]
+
+
+def test_part_delimiter():
+    assert part_delimiter(CONTENT_TYPE) == b'--frame'
+    assert part_delimiter('multipart/x-mixed-replace;Boundary="a b"') == b'--a b'
+    assert part_delimiter('image/jpeg') is None
+    assert part_delimiter('') is None
+
+
+@pytest.mark.parametrize("content_length", [True, False])
+@pytest.mark.parametrize("is_chunked", [True, False])
+def test_frames_survive_any_split(content_length, is_chunked):
+    rng = random.Random(0)
+    for _ in range(50):
+        frames = [fake_jpeg(rng, rng.randrange(0, 400)) for _ in range(rng.randrange(1, 6))]
+        body = multipart(frames, content_length)
+        data = chunked(body, rng) if is_chunked else body
+        parser = StreamParser(CONTENT_TYPE, 'chunked' if is_chunked else '')
+        received = feed_in_pieces(parser, data, rng, max_piece=rng.choice([1, 7, 64, 4096]))
+        # Only the newest frame of a read is returned, but never out of order or corrupted
+        assert received and received[-1] == frames[-1]
+        indices = [frames.index(frame) for frame in received]
+        assert indices == sorted(set(indices))
+        assert parser.framed == content_length
+        assert parser.ended == is_chunked
+
+
+@pytest.mark.parametrize("content_length", [True, False])
+def test_byte_by_byte_returns_every_frame(content_length):
+    rng = random.Random(1)
+    frames = [fake_jpeg(rng, 100) for _ in range(5)]
+    parser = StreamParser(CONTENT_TYPE, 'chunked')
+    data = chunked(multipart(frames, content_length), rng)
+    assert feed_in_pieces(parser, data, rng, max_piece=1) == frames
+
+
+def test_frame_in_the_same_read_as_the_last_chunk():
+    rng = random.Random(2)
+    frame = fake_jpeg(rng, 100)
+    parser = StreamParser(CONTENT_TYPE, 'chunked')
+    span = parser.feed(chunked(multipart([frame]), rng))
+    assert parser.ended
+    assert span is not None and bytes(span[0][span[1]:span[2]]) == frame
+
+
+@pytest.mark.parametrize("content_length", [True, False])
+def test_resyncs_after_overflow(content_length):
+    rng = random.Random(3)
+    frames = [fake_jpeg(rng, 100) for _ in range(3)]
+    # A part whose Content-Length never arrives, followed by good frames
+    if content_length:
+        garbage = b'--frame\r\nContent-Length: 999999\r\n\r\n' + bytes(300)
+        parser = StreamParser(CONTENT_TYPE, '', max_buffer=256)
+    else:
+        # No boundary advertised, so the parser scans for JPEG markers from the start
+        garbage = SOI + bytes(300)
+        parser = StreamParser('image/jpeg', '', max_buffer=256)
+    received = feed_in_pieces(parser, garbage + multipart(frames, content_length), rng, max_piece=32)
+    assert parser.drops >= 1
+    assert received[-1] == frames[-1]
+
+
+def test_resync_into_a_payload_keeps_content_length_framing():
+    rng = random.Random(4)
+    frames = [fake_jpeg(rng, 100) for _ in range(3)]
+    # The dropped part's payload has header-like blank lines past the resync point
+    garbage = b'--frame\r\nContent-Length: 999999\r\n\r\n' + (bytes(100) + b'\r\n\r\n') * 8
+    parser = StreamParser(CONTENT_TYPE, '', max_buffer=256)
+    received = feed_in_pieces(parser, garbage + multipart(frames), rng, max_piece=32)
+    assert parser.drops >= 1
+    assert parser.framed
+    assert received[-1] == frames[-1]
+
+
+def test_dechunk_rejects_malformed_size_line():
+    with pytest.raises(ValueError):
+        dechunk(bytearray(b'zz\r\npayload'), 0, 0)
+
+
+def test_dechunk_waits_for_split_size_line():
+    buf = bytearray(b'abc\r\n1')
+    assert dechunk(buf, 0, 3) == (3, 0)
+    assert buf == b'abc\r\n1'